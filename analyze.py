@@ -0,0 +1,168 @@
+"""Batch analysis of FEN/EPD positions across all cores."""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from typing import Iterable, Iterator
+
+from main import (SHARED_STORE_ENTRIES, GameStatus, Search,
+                  SharedTranspositionStore, board_from_fen, coords_to_input,
+                  get_game_status)
+
+
+DEFAULT_DEPTH = 3
+DEFAULT_CHUNK_SIZE = 4
+
+# Each worker process opens its own mapping of the shared store
+_worker_store: SharedTranspositionStore | None = None
+
+
+def _init_worker(tt_file: str | None):
+    """Pool initializer, opens the shared transposition store in this worker."""
+    global _worker_store
+    if tt_file is not None:
+        _worker_store = SharedTranspositionStore(tt_file)
+
+
+def analyze_position(task: tuple[int, str, int, float | None, int | None]) -> dict:
+    """Searches one position. Runs inside a worker process."""
+    index, fen, depth, time_limit, max_nodes = task
+    start = time.perf_counter()
+    result: dict = {"index": index, "fen": fen}
+    try:
+        board, turn = board_from_fen(fen)
+    except ValueError as ex:
+        result["error"] = str(ex)
+        result["seconds"] = time.perf_counter() - start
+        return result
+    status = get_game_status(board, turn)
+    if status in (GameStatus.CHECKMATE, GameStatus.STALEMATE):
+        result["status"] = status.value
+        result["best_move"] = None
+    else:
+        search = Search(shared_store=_worker_store)
+        best_move = search.iterate(board, turn, depth, time_limit, max_nodes=max_nodes)
+        result["best_move"] = None if best_move is None else coords_to_input(*best_move)
+        # Score is from the point of view of the player to move
+        result["score"] = round(search.best_score, 2)
+        result["depth"] = search.completed_depth
+        result["nodes"] = search.nodes
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def iter_tasks(lines: Iterable[str], depth: int, time_limit: float | None,
+               max_nodes: int | None) -> Iterator[tuple[int, str, int, float | None, int | None]]:
+    """Turns input lines into work items, skipping blanks and # comments."""
+    index = 0
+    for line in lines:
+        fen = line.strip()
+        if fen == "" or fen.startswith("#"):
+            continue
+        yield (index, fen, depth, time_limit, max_nodes)
+        index += 1
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if len(sorted_values) == 0:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def analyze(lines: Iterable[str], output, jobs: int, chunk_size: int, depth: int,
+            time_limit: float | None, max_nodes: int | None,
+            tt_file: str | None = None, tt_entries: int = SHARED_STORE_ENTRIES) -> dict:
+    """Analyzes every position, writing one JSON line per result in input order. Returns the summary."""
+    start = time.perf_counter()
+    latencies: list[float] = []
+    total_nodes = 0
+    errors = 0
+    tasks = iter_tasks(lines, depth, time_limit, max_nodes)
+    if tt_file is not None:
+        # Create the file here with the requested size, workers just open it
+        SharedTranspositionStore(tt_file, tt_entries).close()
+    # Idle workers pull the next chunk from the shared task queue,
+    # imap hands results back in order as soon as the earlier ones are done
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(tt_file,)) as pool:
+        for result in pool.imap(analyze_position, tasks, chunksize=chunk_size):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            latencies.append(result["seconds"])
+            total_nodes += result.get("nodes", 0)
+            if "error" in result:
+                errors += 1
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "positions": len(latencies),
+        "errors": errors,
+        "jobs": jobs,
+        "seconds": elapsed,
+        "positions_per_second": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "nodes_per_second": total_nodes / elapsed if elapsed > 0 else 0.0,
+        "latency_mean": statistics.mean(latencies) if latencies else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p90": percentile(latencies, 0.90),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def print_summary(summary: dict):
+    """Prints throughput and latency percentiles to stderr, so stdout stays machine readable."""
+    print(f"| {summary['positions']} positions ({summary['errors']} errors) "
+          f"in {summary['seconds']:.2f}s on {summary['jobs']} processes", file=sys.stderr)
+    print(f"| {summary['positions_per_second']:.2f} positions/s, "
+          f"{summary['nodes_per_second']:.0f} nodes/s", file=sys.stderr)
+    print(f"| Latency mean {summary['latency_mean']:.3f}s, p50 {summary['latency_p50']:.3f}s, "
+          f"p90 {summary['latency_p90']:.3f}s, p99 {summary['latency_p99']:.3f}s, "
+          f"max {summary['latency_max']:.3f}s", file=sys.stderr)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", nargs="?", default="-", help="FEN/EPD file, one per line, '-' for stdin")
+    parser.add_argument("--output", default="-", help="JSON lines output, '-' for stdout")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="positions handed to a worker at a time")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="maximum search depth")
+    parser.add_argument("--movetime", type=float, help="seconds per position")
+    parser.add_argument("--nodes", type=int, help="search nodes per position")
+    parser.add_argument("--tt-file", help="on-disk transposition store shared by workers and runs")
+    parser.add_argument("--tt-entries", type=int, default=SHARED_STORE_ENTRIES,
+                        help="entries when creating a new store, 16 bytes each")
+    parser.add_argument("--summary", help="also write the summary as JSON here")
+    args = parser.parse_args()
+
+    if args.tt_file is not None:
+        try:
+            SharedTranspositionStore(args.tt_file, args.tt_entries).close()
+        except ValueError as ex:
+            print(f"!!! {ex}", file=sys.stderr)
+            sys.exit(1)
+    input_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = analyze(input_file, output_file, args.jobs, args.chunk_size,
+                          args.depth, args.movetime, args.nodes, args.tt_file, args.tt_entries)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Microbenchmarks for the engine's hot paths, with regression checks against a baseline."""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+from typing import Callable
+
+import main
+from main import (Board, Coords, PieceColor, Search,
+                  board_from_fen, coords_from_string, get_all_legal_moves,
+                  get_all_legal_moves_for_player, get_best_move,
+                  get_board_score_for, is_in_check, is_in_checkmate,
+                  is_move_legal, swap_color)
+from mate import DISPROVEN, PROVEN, MateSolver
+
+
+SEED = 1234
+DEFAULT_REPEAT = 7
+DEFAULT_THRESHOLD = 0.2
+BASELINE_FILE = "bench_baseline.json"
+
+# Fixed positions, as move lists from the starting position
+OPENING_MOVES = "e2e4 e7e5 g1f3 b8c6"
+MIDDLEGAME_MOVES = "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5 d2d3 g8f6 b1c3 d7d6 c1g5 h7h6 g5f6 d8f6 c3d5 f6d8"
+FOOLS_MATE_MOVES = "f2f3 e7e5 g2g4 d8h4"
+# Rook and pawn endgame, white to move
+ENDGAME_FEN = "3r2k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"
+
+# Known puzzles: (FEN, mate in N, whether the mate exists)
+MATE_PUZZLES = [
+    ("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 1, PROVEN),
+    ("r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w - - 4 4", 1, PROVEN),
+    ("6rk/6pp/7N/8/8/8/8/1Q5K w - - 0 1", 1, PROVEN),
+    ("3k4/8/8/8/8/8/8/R3K2R w - - 0 1", 2, PROVEN),
+    ("k7/8/2K5/8/8/8/8/7R w - - 0 1", 2, PROVEN),
+    ("k7/8/4K3/8/8/8/8/7R w - - 0 1", 2, DISPROVEN),
+]
+
+def board_from_moves(moves: str) -> tuple[Board, PieceColor]:
+    """Plays 'e2e4 e7e5 ...' from the starting position. Returns the board and the side to move."""
+    board = Board()
+    board.standard_board_setup()
+    turn = PieceColor.WHITE
+    for move_str in moves.split():
+        old_coords = coords_from_string(move_str[:2])
+        new_coords = coords_from_string(move_str[2:])
+        if old_coords is None or new_coords is None or not is_move_legal(board, old_coords, new_coords):
+            raise ValueError(f"Illegal move in benchmark position: {move_str}")
+        board.move(old_coords, new_coords)
+        board.next_turn()
+        turn = swap_color(turn)
+    return board, turn
+
+
+def get_positions() -> dict[str, tuple[Board, PieceColor]]:
+    """Returns the fixed benchmark positions by name."""
+    return {
+        "opening": board_from_moves(OPENING_MOVES),
+        "middlegame": board_from_moves(MIDDLEGAME_MOVES),
+        "endgame": board_from_fen(ENDGAME_FEN),
+        "mated": board_from_moves(FOOLS_MATE_MOVES),
+    }
+
+
+def _occupied_squares(board: Board) -> list[Coords]:
+    """Returns the coords of every piece on the board."""
+    return board.get_piece_coords(PieceColor.WHITE) + board.get_piece_coords(PieceColor.BLACK)
+
+
+def get_positions_with_moves() -> list[tuple[Board, list[tuple[Coords, Coords]]]]:
+    """Returns each fixed position with its legal moves, so generation isn't timed."""
+    return [(board, get_all_legal_moves_for_player(board, turn, check_check=True))
+            for board, turn in get_positions().values()]
+
+
+def bench_move_revert(positions_with_moves) -> int:
+    """Board.move followed by revert_last_move for every legal move."""
+    ops = 0
+    for board, legal in positions_with_moves:
+        for coords in legal:
+            board.move(*coords)
+            board.revert_last_move()
+            ops += 1
+    return ops
+
+
+def bench_legal_moves(positions) -> int:
+    """get_all_legal_moves for every piece, including the self-check pruning."""
+    ops = 0
+    for board, _ in positions.values():
+        for coords in _occupied_squares(board):
+            get_all_legal_moves(board, coords)
+            ops += 1
+    return ops
+
+
+def bench_is_in_check(positions) -> int:
+    """is_in_check for both colors."""
+    ops = 0
+    for board, _ in positions.values():
+        for color in PieceColor:
+            is_in_check(board, color)
+            ops += 1
+    return ops
+
+
+def bench_is_in_checkmate(positions) -> int:
+    """is_in_checkmate for the side to move."""
+    ops = 0
+    for board, turn in positions.values():
+        is_in_checkmate(board, turn)
+        ops += 1
+    return ops
+
+
+def bench_board_score(positions) -> int:
+    """get_board_score_for the side to move."""
+    ops = 0
+    for name, (board, turn) in positions.items():
+        if name == "mated":
+            continue
+        get_board_score_for(board, turn)
+        ops += 1
+    return ops
+
+
+def bench_best_move_depth_1(positions) -> int:
+    """get_best_move at depth 1 (one ply plus quiescence)."""
+    return _bench_best_move(positions, 1)
+
+
+def bench_best_move_depth_2(positions) -> int:
+    """get_best_move at depth 2 (full search)."""
+    return _bench_best_move(positions, 2)
+
+
+def _bench_best_move(positions, depth: int) -> int:
+    """get_best_move at a fixed depth for every position that has moves."""
+    ops = 0
+    for name, (board, turn) in positions.items():
+        if name == "mated":
+            continue
+        get_best_move(board, turn, depth)
+        ops += 1
+    return ops
+
+
+def bench_get_string(positions) -> int:
+    """Board.get_string with coordinates and a highlight."""
+    ops = 0
+    for board, _ in positions.values():
+        for _ in range(50):
+            board.get_string(True, [Coords(4, 3)])
+            ops += 1
+    return ops
+
+
+def get_mate_puzzles() -> list[tuple[Board, PieceColor, int, str]]:
+    """Returns the mate puzzle positions with the expected answers."""
+    return [(*board_from_fen(fen), moves, expected) for fen, moves, expected in MATE_PUZZLES]
+
+
+def bench_mate_puzzles(puzzles) -> int:
+    """MateSolver on every puzzle. Fails if an answer is wrong."""
+    ops = 0
+    for board, turn, moves, expected in puzzles:
+        status, _ = MateSolver().solve(board, turn, moves)
+        if status != expected:
+            raise AssertionError(f"Mate in {moves} puzzle {ops} was {status}, expected {expected}")
+        ops += 1
+    return ops
+
+
+# Name -> (benchmark, untimed setup that builds its input)
+BENCHMARKS: dict[str, tuple[Callable, Callable]] = {
+    "move_revert": (bench_move_revert, get_positions_with_moves),
+    "legal_moves": (bench_legal_moves, get_positions),
+    "is_in_check": (bench_is_in_check, get_positions),
+    "is_in_checkmate": (bench_is_in_checkmate, get_positions),
+    "board_score": (bench_board_score, get_positions),
+    "best_move_depth_1": (bench_best_move_depth_1, get_positions),
+    "best_move_depth_2": (bench_best_move_depth_2, get_positions),
+    "get_string": (bench_get_string, get_positions),
+    "mate_puzzles": (bench_mate_puzzles, get_mate_puzzles),
+}
+
+
+# Selective search configurations: (null move, late move reductions, check extensions)
+SELECTIVE_CONFIGS = {
+    "plain": (False, False, False),
+    "null_move": (True, False, False),
+    "late_move_reductions": (False, True, False),
+    "check_extensions": (False, False, True),
+    "all": (True, True, True),
+}
+
+
+def run_selective(time_limit: float) -> dict:
+    """Searches every position for time_limit seconds per configuration, reporting depth reached."""
+    results = {}
+    for name, config in SELECTIVE_CONFIGS.items():
+        depths: list[int] = []
+        nodes = 0
+        elapsed = 0.0
+        for position_name, (board, turn) in get_positions().items():
+            if position_name == "mated":
+                continue
+            search = Search(*config)
+            start = time.perf_counter()
+            search.iterate(board, turn, main.SEARCH_DEPTH, time_limit)
+            elapsed += time.perf_counter() - start
+            depths.append(search.completed_depth)
+            nodes += search.nodes
+        results[name] = {
+            "depths": depths,
+            "mean_depth": statistics.mean(depths),
+            "nodes_per_second": nodes / elapsed if elapsed > 0 else 0.0,
+        }
+        print(f"| {name:<20} depths {depths} {results[name]['nodes_per_second']:8.1f} nodes/s")
+    return results
+
+
+def run_benchmark(function: Callable, setup: Callable, repeat: int) -> dict[str, float]:
+    """
+    Times a benchmark on fresh input, after a warm-up pass. Each run loops the benchmark
+    for at least 0.2s, and every time is per op so the loop count doesn't matter.
+    """
+    random.seed(SEED)
+    data = setup()
+    # Warm-up, fills the pawn hash table and other lazily built state
+    ops = function(data)
+    timer = timeit.Timer(lambda: function(data))
+    # autorange settles on the first of 1, 2, 5, 10, 20, ... loops that takes 0.2s
+    loops, _ = timer.autorange()
+    times = [seconds / (loops * ops) for seconds in timer.repeat(repeat, loops)]
+    best = min(times)
+    return {
+        "seconds_per_op": best,
+        "median_seconds_per_op": statistics.median(times),
+        "max_seconds_per_op": max(times),
+        "loops": loops,
+        "ops": ops,
+        "ops_per_second": 1 / best if best > 0 else 0.0,
+    }
+
+
+def run_all(names: list[str], repeat: int) -> dict:
+    """Runs the named benchmarks with the legal move cache off. Returns the JSON report."""
+    caching = main.LEGAL_MOVE_CACHING
+    # Measure the generators themselves, not cache hits
+    main.LEGAL_MOVE_CACHING = False
+    results = {}
+    try:
+        for name in names:
+            results[name] = run_benchmark(*BENCHMARKS[name], repeat)
+            print(f"| {name:<20} {results[name]['seconds_per_op'] * 1000000:12.1f} us/op "
+                  f"{results[name]['ops_per_second']:10.1f} ops/s")
+    finally:
+        main.LEGAL_MOVE_CACHING = caching
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": SEED,
+        },
+        "results": results,
+        "pawn_hash": main.PAWN_HASH_TABLE.get_stats(),
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Prints the change against the baseline. Returns the names that regressed beyond threshold.
+    A benchmark only regresses if its fastest run is slower than the baseline's slowest run
+    plus the threshold, so run-to-run noise in either report isn't flagged.
+    """
+    regressions: list[str] = []
+    for name, result in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        # Baselines from before per-op timing can't be compared
+        if old is None or old.get("max_seconds_per_op", 0) <= 0:
+            print(f"| {name:<20} no baseline")
+            continue
+        ratio = result["seconds_per_op"] / old["seconds_per_op"]
+        status = "ok"
+        if result["seconds_per_op"] > old["max_seconds_per_op"] * (1 + threshold):
+            status = "REGRESSION"
+            regressions.append(name)
+        print(f"| {name:<20} {ratio:6.2f}x baseline  {status}")
+    return regressions
+
+
+def main_cli():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before failing, 0.2 = 20%%")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--selective", type=float, metavar="SECONDS",
+                        help="also compare the depth reached with each selective search feature")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="benchmarks to run")
+    args = parser.parse_args()
+
+    report = run_all(args.only or list(BENCHMARKS), args.repeat)
+    if args.selective is not None:
+        report["selective"] = run_selective(args.selective)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"| Saved baseline to {args.baseline}")
+        return
+    try:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print(f"| No baseline at {args.baseline}, run with --save-baseline to create one")
+        return
+    regressions = compare(report, baseline, args.threshold)
+    if regressions:
+        print(f"!!! {len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
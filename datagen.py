@@ -0,0 +1,238 @@
+"""Bulk (position, eval, result) record generation for evaluation training."""
+import argparse
+import random
+import struct
+import sys
+import time
+from typing import Iterable, Iterator
+
+from main import (Board, Coords, PieceColor, PieceType, GameStatus,
+                  coords_from_string, get_all_legal_moves_for_player,
+                  get_game_status, is_move_legal, quiescence_search, swap_color)
+
+# NumPy is only needed to read the records back
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# File layout: 16 byte header, then fixed-width records
+MAGIC = b"PYCHESS\x00"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")
+# board (2 squares per byte), side to move, en passant square, halfmove clock, eval, result
+RECORD = struct.Struct("<32sBBBhb")
+RECORD_SIZE = RECORD.size
+NO_EN_PASSANT = 255
+CHUNK_RECORDS = 4096
+
+# Square codes, 0 is an empty square
+PIECE_CODES: dict[tuple[PieceType, PieceColor], int] = {}
+for _i, _piece_type in enumerate(PieceType):
+    PIECE_CODES[(_piece_type, PieceColor.WHITE)] = _i + 1
+    PIECE_CODES[(_piece_type, PieceColor.BLACK)] = _i + 7
+
+RESULT_SCORES = {"1-0": 1, "0-1": -1, "1/2-1/2": 0}
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([
+        ("board", np.uint8, (32,)),
+        ("side", np.uint8),
+        ("en_passant", np.uint8),
+        ("halfmove", np.uint8),
+        ("eval", "<i2"),
+        ("result", np.int8),
+    ])
+    assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+
+def pack_board(board: Board) -> bytes:
+    """Packs the piece placement into 32 bytes, square index is y * 8 + x."""
+    squares = [0] * 64
+    for color, by_type in board.piece_squares.items():
+        for piece_type, piece_squares in by_type.items():
+            for x, y in piece_squares:
+                squares[y * 8 + x] = PIECE_CODES[(piece_type, color)]
+    return bytes(squares[i] | (squares[i + 1] << 4) for i in range(0, 64, 2))
+
+
+def pack_position(board: Board, turn: PieceColor, eval_cp: int) -> tuple[bytes, int, int, int, int]:
+    """Returns every record field except the result. eval_cp is for the side to move."""
+    en_passant = NO_EN_PASSANT
+    if board.en_passant_cap is not None:
+        en_passant = board.en_passant_cap.y * 8 + board.en_passant_cap.x
+    return (pack_board(board), 0 if turn == PieceColor.WHITE else 1, en_passant,
+            min(255, board.halfmove_clock), max(-32768, min(32767, eval_cp)))
+
+
+def parse_game_move(move_str: str) -> tuple[Coords, Coords] | None:
+    """Parses a move in 'e2e4' format. Returns None if invalid."""
+    if len(move_str) != 4:
+        return None
+    old_coords = coords_from_string(move_str[:2])
+    new_coords = coords_from_string(move_str[2:])
+    if old_coords is None or new_coords is None:
+        return None
+    return (old_coords, new_coords)
+
+
+def iter_self_play_games(games: int, seed: int = 0,
+                         max_plies: int = 200) -> Iterator[tuple[list[str], int | None]]:
+    """Plays random legal games. Yields (moves, result), result is None if unfinished."""
+    rng = random.Random(seed)
+    for _ in range(games):
+        board = Board()
+        board.standard_board_setup()
+        turn = PieceColor.WHITE
+        moves: list[str] = []
+        result = None
+        for _ in range(max_plies):
+            status = get_game_status(board, turn)
+            if status == GameStatus.CHECKMATE:
+                result = 1 if turn == PieceColor.BLACK else -1
+                break
+            if status != GameStatus.ONGOING:
+                result = 0
+                break
+            old_coords, new_coords = rng.choice(
+                get_all_legal_moves_for_player(board, turn, check_check=True))
+            moves.append(old_coords.get_string() + new_coords.get_string())
+            board.move(old_coords, new_coords)
+            board.next_turn()
+            turn = swap_color(turn)
+        yield moves, result
+
+
+def iter_replayed_games(lines: Iterable[str]) -> Iterator[tuple[list[str], int | None]]:
+    """Reads one game per line, 'e2e4 e7e5 ...' with an optional '1-0', '0-1' or '1/2-1/2' at the end."""
+    for line in lines:
+        tokens = line.split()
+        if len(tokens) == 0:
+            continue
+        result = None
+        if tokens[-1] in RESULT_SCORES:
+            result = RESULT_SCORES[tokens.pop()]
+        yield tokens, result
+
+
+def iter_records(games: Iterable[tuple[list[str], int | None]]) -> Iterator[bytes]:
+    """Replays each game, evaluates every position and yields packed records."""
+    for moves, result in games:
+        board = Board()
+        board.standard_board_setup()
+        turn = PieceColor.WHITE
+        positions: list[tuple[bytes, int, int, int, int]] = []
+        for move_str in moves:
+            coords = parse_game_move(move_str)
+            piece = None if coords is None else board.get_piece(coords[0])
+            position = None
+            if coords is not None and piece is not None and piece.color == turn \
+                    and is_move_legal(board, *coords):
+                eval_cp = round(quiescence_search(board, turn) * 100)
+                position = pack_position(board, turn, eval_cp)
+            if position is None or not board.move(*coords):
+                print(f"!!! Bad move '{move_str}', skipping the game", file=sys.stderr)
+                # The declared result doesn't belong to the positions before the bad move
+                positions = []
+                break
+            positions.append(position)
+            board.next_turn()
+            turn = swap_color(turn)
+        if result is None:
+            # Unfinished games count as draws unless they ended in mate
+            status = get_game_status(board, turn)
+            result = 0
+            if status == GameStatus.CHECKMATE:
+                result = 1 if turn == PieceColor.BLACK else -1
+        # Results are from white's point of view
+        for fields in positions:
+            yield RECORD.pack(*fields, result)
+
+
+def write_records(path: str, records: Iterable[bytes], chunk_records: int = CHUNK_RECORDS) -> int:
+    """Streams records to a binary file in chunks. Returns the number of records written."""
+    count = 0
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_SIZE))
+        chunk = bytearray()
+        for record in records:
+            chunk += record
+            count += 1
+            if count % chunk_records == 0:
+                file.write(chunk)
+                chunk.clear()
+        file.write(chunk)
+    return count
+
+
+def _require_numpy():
+    """Raises ImportError if NumPy is missing."""
+    if np is None:
+        raise ImportError("Reading training records requires numpy (pip install numpy)")
+
+
+def read_records(path: str):
+    """Memory-maps a record file as a NumPy structured array, without copying it."""
+    _require_numpy()
+    with open(path, "rb") as file:
+        magic, version, record_size = HEADER.unpack(file.read(HEADER.size))
+        empty = len(file.read(RECORD_SIZE)) == 0
+    if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD_SIZE:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} record file")
+    # NumPy can't map an empty range
+    if empty:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size)
+
+
+def unpack_squares(records):
+    """Returns an (n, 64) array of square codes for the given records."""
+    _require_numpy()
+    packed = records["board"]
+    squares = np.empty((len(records), 64), dtype=np.uint8)
+    squares[:, 0::2] = packed & 0x0F
+    squares[:, 1::2] = packed >> 4
+    return squares
+
+
+def iter_shuffled_batches(records, batch_size: int = 1024, seed: int = 0):
+    """Yields batches of records in a random order. Indices are sorted per batch for locality."""
+    _require_numpy()
+    order = np.random.default_rng(seed).permutation(len(records))
+    for start in range(0, len(order), batch_size):
+        yield records[np.sort(order[start:start + batch_size])]
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output", help="record file to write")
+    parser.add_argument("--games", type=int, default=100, help="number of self-play games")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--replay", help="file of games to replay instead of self-play, '-' for stdin")
+    args = parser.parse_args()
+
+    if args.replay is None:
+        games = iter_self_play_games(args.games, args.seed, args.max_plies)
+        count = _write_timed(args.output, games)
+    elif args.replay == "-":
+        count = _write_timed(args.output, iter_replayed_games(sys.stdin))
+    else:
+        with open(args.replay, encoding="utf-8") as file:
+            count = _write_timed(args.output, iter_replayed_games(file))
+    print(f"| Wrote {count} records to {args.output}")
+
+
+def _write_timed(path: str, games: Iterable[tuple[list[str], int | None]]) -> int:
+    """Writes the records of the given games and prints the throughput."""
+    start = time.perf_counter()
+    count = write_records(path, iter_records(games))
+    elapsed = time.perf_counter() - start
+    print(f"| {count / elapsed if elapsed > 0 else 0:.0f} records/s")
+    return count
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
 """Chess game, innit"""
+from collections import OrderedDict
 from copy import deepcopy
 from enum import Enum
+import mmap
+import os
 import random
+import struct
 import sys
+import threading
+import time
 
 
 # TODO: Castling
@@ -30,6 +36,43 @@ WHITE_SIDES = "░"
 BLACK_SIDES = " "
 # ░ ▒ ▓
 
+# Plies without a capture or pawn move before the game is drawn (fifty-move rule)
+FIFTY_MOVE_LIMIT = 100
+# Number of times a position must occur to be drawn by repetition
+REPETITION_LIMIT = 3
+
+# Cache legal move generation results by position hash
+LEGAL_MOVE_CACHING = True
+LEGAL_MOVE_CACHE_SIZE = 4096
+
+# Pawn structure evaluation, cached by pawn placement
+PAWN_STRUCTURE_EVAL = True
+PAWN_HASH_SIZE = 16384
+DOUBLED_PAWN_PENALTY = 0.25
+ISOLATED_PAWN_PENALTY = 0.2
+PASSED_PAWN_BONUS = 0.2
+PASSED_PAWN_RANK_BONUS = 0.1
+
+# Bot extends its search through captures until the position is quiet
+QUIESCENCE_SEARCH = True
+QUIESCENCE_DEPTH = 8
+
+# Bot search settings. The bot deepens its search until its time for the move runs out.
+SEARCH_DEPTH = 64
+PONDERING = True
+# Selective search: skip, shorten or lengthen lines depending on how promising they are
+NULL_MOVE_PRUNING = True
+NULL_MOVE_REDUCTION = 2
+LATE_MOVE_REDUCTIONS = True
+LATE_MOVE_MIN_DEPTH = 3
+LATE_MOVE_MIN_INDEX = 3
+CHECK_EXTENSIONS = True
+# Entries in a newly created on-disk transposition store, 16 bytes each
+SHARED_STORE_ENTRIES = 1 << 20
+GAME_CLOCK_SECONDS = 300
+CLOCK_INCREMENT_SECONDS = 2
+MOVES_TO_GO = 30
+
 
 class PieceColor(Enum):
     """Enum to represent a chess piece color."""
@@ -101,6 +144,28 @@ def piece_type_to_str(piece_type: PieceType) -> str:
     return result
 
 
+class GameStatus(Enum):
+    """Enum to represent the state of the game for the player to move."""
+    ONGOING = "Ongoing"
+    CHECKMATE = "Checkmate"
+    STALEMATE = "Stalemate"
+    THREEFOLD_REPETITION = "Threefold repetition"
+    FIFTY_MOVE_RULE = "Fifty-move rule"
+
+
+# Zobrist hashing keys, seeded so hashes are the same on every run
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES: dict[tuple[str, PieceType, PieceColor], int] = {
+    (letter + number, piece_type, color): _zobrist_random.getrandbits(64)
+    for letter in "abcdefgh"
+    for number in "12345678"
+    for piece_type in PieceType
+    for color in PieceColor
+}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(WIDTH)]
+
+
 class Coords:
     """Object to represent a position on a chess board."""
     LETTERS = "abcdefgh"
@@ -204,11 +269,18 @@ class Piece:
         return result + " "
 
 
+def _empty_piece_squares() -> dict[PieceColor, dict[PieceType, set[tuple[int, int]]]]:
+    """Returns empty piece lists, a set of (x, y) squares per color and piece type."""
+    return {color: {piece_type: set() for piece_type in PieceType} for color in PieceColor}
+
+
 class Board:
     """Class to represent a chess board."""
 
     def __init__(self):
         self.pieces: dict[str, Piece | None] = {}
+        # Squares of every piece, per color and type, kept in sync by set_piece and remove_piece
+        self.piece_squares = _empty_piece_squares()
         self.last_move = {
             "old_coords": Coords,
             "new_coords": Coords,
@@ -216,7 +288,17 @@ class Board:
             "captured_piece": Piece,
             "last_coords": Coords
         }
+        # Stack of saved move states, so nested simulations can be reverted in order
+        self.move_history: list[dict] = []
         self.turn_counter = 1
+        # Plies since the last capture or pawn move
+        self.halfmove_clock = 0
+        # Zobrist hash of the piece placement, updated by set_piece
+        self.zobrist_hash = 0
+        # Zobrist hash of the pawns only, for the pawn hash table
+        self.pawn_hash = 0
+        # Stack of position hashes, one per turn, for repetition detection
+        self.position_history: list[int] = []
         self.en_passant_cap: Coords | None = None
         self.en_passant_victim: Coords | None = None
         self.en_passantable_turn: int = 0
@@ -226,6 +308,12 @@ class Board:
     def clear(self):
         """Reset the board."""
         self.pieces = {}
+        self.piece_squares = _empty_piece_squares()
+        self.zobrist_hash = 0
+        self.pawn_hash = 0
+        self.halfmove_clock = 0
+        self.position_history = []
+        self.move_history = []
 
     def get_piece(self, coords: Coords) -> Piece | None:
         """Returns the piece at a given coords. Returns None if no piece exists."""
@@ -236,11 +324,57 @@ class Board:
 
     def set_piece(self, piece: Piece | None, coords: Coords):
         """Sets a piece at a given coords."""
-        self.pieces[coords.to_board_key()] = piece
+        key = coords.to_board_key()
+        self._vacate_square(key, coords)
+        self.pieces[key] = piece
+        if piece is not None:
+            self.zobrist_hash ^= ZOBRIST_PIECES[(key, piece.type, piece.color)]
+            if piece.type == PieceType.PAWN:
+                self.pawn_hash ^= ZOBRIST_PIECES[(key, piece.type, piece.color)]
+            self.piece_squares[piece.color][piece.type].add((coords.x, coords.y))
 
     def remove_piece(self, coords: Coords):
         """Erases any piece at the given coords."""
-        self.pieces[coords.to_board_key()] = None
+        key = coords.to_board_key()
+        self._vacate_square(key, coords)
+        self.pieces[key] = None
+
+    def _vacate_square(self, key: str, coords: Coords):
+        """Removes the piece at the given square from the zobrist hashes and the piece lists."""
+        old_piece = self.pieces.get(key)
+        if old_piece is not None:
+            self.zobrist_hash ^= ZOBRIST_PIECES[(key, old_piece.type, old_piece.color)]
+            if old_piece.type == PieceType.PAWN:
+                self.pawn_hash ^= ZOBRIST_PIECES[(key, old_piece.type, old_piece.color)]
+            self.piece_squares[old_piece.color][old_piece.type].discard((coords.x, coords.y))
+
+    def get_piece_coords(self, color: PieceColor, piece_type: PieceType | None = None) -> list[Coords]:
+        """Returns the coords of every piece of the given color, optionally of one type only."""
+        by_type = self.piece_squares[color]
+        if piece_type is not None:
+            return [Coords(x, y) for x, y in by_type[piece_type]]
+        return [Coords(x, y) for squares in by_type.values() for x, y in squares]
+
+    def get_king_coords(self, color: PieceColor) -> Coords | None:
+        """Returns the coords of the given color's king. Returns None if it has none."""
+        for x, y in self.piece_squares[color][PieceType.KING]:
+            return Coords(x, y)
+        return None
+
+    def get_turn(self) -> PieceColor:
+        """Returns the color of the player whose turn it is."""
+        return PieceColor.WHITE if self.turn_counter % 2 == 1 else PieceColor.BLACK
+
+    def get_position_hash(self, turn: PieceColor | None = None) -> int:
+        """Returns a hash of the position. Uses the current turn if none is given."""
+        if turn is None:
+            turn = self.get_turn()
+        result = self.zobrist_hash
+        if turn == PieceColor.BLACK:
+            result ^= ZOBRIST_BLACK_TO_MOVE
+        if self.en_passant_cap is not None:
+            result ^= ZOBRIST_EN_PASSANT[self.en_passant_cap.x]
+        return result
 
     def move(self, old_coords: Coords, new_coords: Coords) -> bool:
         """Moves a piece from old_coords to new_coords. Returns True if successful."""
@@ -252,6 +386,7 @@ class Board:
             return False
         # Checks passed, move is happening
         # Backup last state for simulation moves
+        self.last_move = {}
         self.last_move["old_coords"] = deepcopy(old_coords)
         self.last_move["new_coords"] = deepcopy(new_coords)
         self.last_move["old_piece"] = deepcopy(piece)
@@ -260,6 +395,27 @@ class Board:
         self.last_move["en_passant_victim"] = deepcopy(self.en_passant_victim)
         self.last_move["en_passantable_turn"] = self.en_passantable_turn
         self.last_move["last_coords"] = deepcopy(self.last_coords)
+        self.last_move["halfmove_clock"] = self.halfmove_clock
+        self.last_move["en_passant_captured_piece"] = None
+        # Searches call next_turn after simulated moves, so save what it changes
+        self.last_move["turn_counter"] = self.turn_counter
+        self.last_move["history_length"] = len(self.position_history)
+        self.move_history.append(self.last_move)
+
+        # En passant capture, the victim is not on the square moved to
+        if piece.type == PieceType.PAWN and self.en_passant_cap is not None \
+                and self.en_passant_victim is not None and old_coords.x != new_coords.x \
+                and new_coords.x == self.en_passant_cap.x and new_coords.y == self.en_passant_cap.y:
+            victim = self.get_piece(self.en_passant_victim)
+            if victim is not None and victim.color != piece.color:
+                self.last_move["en_passant_captured_piece"] = deepcopy(victim)
+                self.remove_piece(self.en_passant_victim)
+
+        # Fifty-move rule counter resets on captures and pawn moves
+        if piece.type == PieceType.PAWN or self.get_piece(new_coords) is not None:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
 
         # Set en passant vulnerability
         if piece.type == PieceType.PAWN and piece.has_moved is False:
@@ -284,9 +440,37 @@ class Board:
             self.en_passant_cap = None
             self.en_passant_victim = None
             self.en_passantable_turn = 0
+        self.position_history.append(self.get_position_hash())
+
+    def pass_turn(self):
+        """Gives the turn away without moving, for null move pruning. Undo with revert_last_move."""
+        self.last_move = {
+            "null_move": True,
+            "en_passant_cap": self.en_passant_cap,
+            "en_passant_victim": self.en_passant_victim,
+            "en_passantable_turn": self.en_passantable_turn,
+            "turn_counter": self.turn_counter,
+            "history_length": len(self.position_history),
+        }
+        self.move_history.append(self.last_move)
+        self.en_passant_cap = None
+        self.en_passant_victim = None
+        self.en_passantable_turn = 0
+        self.turn_counter += 1
+        self.position_history.append(self.get_position_hash())
 
     def revert_last_move(self):
         """Reverts the board to the last move. Reverts piece flags with saved deep copies."""
+        if len(self.move_history) == 0:
+            return
+        self.last_move = self.move_history.pop()
+        if self.last_move.get("null_move"):
+            self.en_passant_cap = self.last_move["en_passant_cap"]
+            self.en_passant_victim = self.last_move["en_passant_victim"]
+            self.en_passantable_turn = self.last_move["en_passantable_turn"]
+            self.turn_counter = self.last_move["turn_counter"]
+            del self.position_history[self.last_move["history_length"]:]
+            return
         self.set_piece(self.last_move["old_piece"],
                        self.last_move["old_coords"])
         self.set_piece(
@@ -295,6 +479,12 @@ class Board:
         self.en_passant_victim = self.last_move["en_passant_victim"]
         self.en_passantable_turn = self.last_move["en_passantable_turn"]
         self.last_coords = self.last_move["last_coords"]
+        self.halfmove_clock = self.last_move["halfmove_clock"]
+        if self.last_move["en_passant_captured_piece"] is not None:
+            self.set_piece(self.last_move["en_passant_captured_piece"],
+                           self.en_passant_victim)
+        self.turn_counter = self.last_move["turn_counter"]
+        del self.position_history[self.last_move["history_length"]:]
 
     def get_string(self, show_coords: bool = False, highlight_list: list[Coords] | None = None):
         """
@@ -365,6 +555,127 @@ class Board:
         self.set_piece(Piece(PieceType.BISHOP, PieceColor.BLACK), Coords(5, 7))
         self.set_piece(Piece(PieceType.KNIGHT, PieceColor.BLACK), Coords(6, 7))
         self.set_piece(Piece(PieceType.ROOK, PieceColor.BLACK), Coords(7, 7))
+        self.position_history = [self.get_position_hash()]
+
+
+class LegalMoveCache:
+    """Bounded least-recently-used cache for legal move lists, keyed by position hash."""
+
+    def __init__(self, max_size: int = LEGAL_MOVE_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # The pondering thread shares the cache with the main thread
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple | None:
+        """Returns the cached value for key, or None. Marks the entry as recently used."""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: tuple) -> tuple | None:
+        """Returns the cached value for key, or None, without touching the statistics or LRU order."""
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key: tuple, value: tuple):
+        """Stores a value, evicting the least recently used entry if full."""
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Empties the cache and resets the statistics."""
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> dict[str, int | float]:
+        """Returns hit/miss statistics for the cache."""
+        with self.lock:
+            hits, misses, size = self.hits, self.misses, len(self.entries)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "size": size,
+            "max_size": self.max_size,
+            "hit_rate": hits / lookups if lookups > 0 else 0.0,
+        }
+
+
+# Entries are keyed by the position hash, so any move invalidates them automatically
+LEGAL_MOVE_CACHE = LegalMoveCache()
+
+
+FEN_PIECES = {"P": PieceType.PAWN, "N": PieceType.KNIGHT, "B": PieceType.BISHOP,
+              "R": PieceType.ROOK, "Q": PieceType.QUEEN, "K": PieceType.KING}
+
+
+def board_from_fen(fen: str) -> tuple[Board, PieceColor]:
+    """
+    Sets up a board from a FEN or EPD string. Returns the board and the player to move.
+    Castling rights are ignored since castling isn't implemented. Raises ValueError if invalid.
+    """
+    fields = fen.split()
+    if len(fields) < 2:
+        raise ValueError(f"Not enough FEN fields: '{fen}'")
+    rows = fields[0].split("/")
+    if len(rows) != HEIGHT:
+        raise ValueError(f"FEN needs {HEIGHT} rows: '{fields[0]}'")
+    board = Board()
+    board.clear()
+    for row_index, row in enumerate(rows):
+        y = HEIGHT - 1 - row_index
+        x = 0
+        for char in row:
+            if char.isdigit():
+                x += int(char)
+                continue
+            piece_type = FEN_PIECES.get(char.upper())
+            if piece_type is None or x >= WIDTH:
+                raise ValueError(f"Bad FEN row: '{row}'")
+            color = PieceColor.WHITE if char.isupper() else PieceColor.BLACK
+            piece = Piece(piece_type, color)
+            # Pawns off their starting rank can't advance two squares
+            start_rank = 1 if color == PieceColor.WHITE else 6
+            piece.has_moved = piece_type == PieceType.PAWN and y != start_rank
+            board.set_piece(piece, Coords(x, y))
+            x += 1
+        if x != WIDTH:
+            raise ValueError(f"Bad FEN row: '{row}'")
+
+    if fields[1] not in ("w", "b"):
+        raise ValueError(f"Bad FEN side to move: '{fields[1]}'")
+    turn = PieceColor.WHITE if fields[1] == "w" else PieceColor.BLACK
+    # EPD has operations instead of the move counters
+    halfmove, fullmove = 0, 1
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        halfmove, fullmove = int(fields[4]), max(1, int(fields[5]))
+    board.turn_counter = (fullmove - 1) * 2 + (1 if turn == PieceColor.WHITE else 2)
+    board.halfmove_clock = halfmove
+
+    if len(fields) >= 4 and fields[3] != "-":
+        cap = coords_from_string(fields[3])
+        if cap is None:
+            raise ValueError(f"Bad FEN en passant square: '{fields[3]}'")
+        # The pawn that just advanced two squares is one step past the capture square
+        dy = -1 if turn == PieceColor.WHITE else 1
+        board.en_passant_cap = cap
+        board.en_passant_victim = Coords(cap.x, cap.y + dy)
+        board.en_passantable_turn = board.turn_counter - 1
+    board.position_history = [board.get_position_hash()]
+    return board, turn
 
 
 def parse_move(move_str: str, delimiter: str = " to ") -> tuple[Coords, Coords] | None:
@@ -457,6 +768,18 @@ def prune_all_self_checking_moves(board: Board, old: Coords, legal: list[Coords]
 
 def get_all_legal_moves(board: Board, old_coords: Coords, check_check: bool = True) -> list[Coords]:
     """Returns a list of every legal move the piece at old_coords can make."""
+    if not (LEGAL_MOVE_CACHING and check_check):
+        return _generate_legal_moves(board, old_coords, check_check)
+    key = ("square", board.get_position_hash(), old_coords.to_board_key())
+    cached = LEGAL_MOVE_CACHE.get(key)
+    if cached is None:
+        cached = tuple(_generate_legal_moves(board, old_coords, check_check))
+        LEGAL_MOVE_CACHE.put(key, cached)
+    return list(cached)
+
+
+def _generate_legal_moves(board: Board, old_coords: Coords, check_check: bool) -> list[Coords]:
+    """Generates the legal moves for the piece at old_coords without using the cache."""
     legal: list[Coords] = []
     possible_capture: list[Coords] = []
     en_passant: list[Coords] = []
@@ -611,11 +934,9 @@ def move(board: Board, move_str: str, turn: PieceColor) -> bool:
             err_in_check()
             return False
         # Move success
-        # En passant capture
-        if board.en_passant_cap is not None and board.en_passant_victim is not None:
-            if coords[1].x == board.en_passant_cap.x and coords[1].y == board.en_passant_cap.y:
-                captured_piece = board.get_piece(board.en_passant_victim)
-                board.remove_piece(board.en_passant_victim)
+        # En passant capture, the board already removed the victim
+        if board.last_move["en_passant_captured_piece"] is not None:
+            captured_piece = board.last_move["en_passant_captured_piece"]
         board.next_turn()
         if captured_piece is not None:
             capture(captured_piece)
@@ -739,17 +1060,22 @@ def handle_input(board: Board, turn: PieceColor, user_input: str) -> bool:
 
 def get_all_legal_moves_for_player(board: Board, turn: PieceColor, check_check: bool = False):
     """Returns list of tuple pairs of coordinates representing every possible move for a player."""
+    if not (LEGAL_MOVE_CACHING and check_check):
+        return _generate_legal_moves_for_player(board, turn, check_check)
+    key = ("player", board.get_position_hash(), turn)
+    cached = LEGAL_MOVE_CACHE.get(key)
+    if cached is None:
+        cached = tuple(_generate_legal_moves_for_player(board, turn, check_check))
+        LEGAL_MOVE_CACHE.put(key, cached)
+    return list(cached)
+
+
+def _generate_legal_moves_for_player(board: Board, turn: PieceColor, check_check: bool):
+    """Generates every move for a player without using the cache."""
     # Moves are Coords tuple pairs, eg (a4, b5)
     all_moves: list[tuple[Coords, Coords]] = []
-    # Copy to avoid dict change during iteration err
-    pieces = board.pieces.copy()
-    for coords in pieces.keys():
-        old_coords = coords_from_string(coords)
-        if old_coords is None:
-            continue
-        piece = board.get_piece(old_coords)
-        if piece is None or piece.color != turn:
-            continue
+    # The piece list is a fresh list, so simulated moves can't change it under us
+    for old_coords in board.get_piece_coords(turn):
         legal = get_all_legal_moves(board, old_coords, check_check)
         for new_coords in legal:
             all_moves.append((old_coords, new_coords))
@@ -776,20 +1102,26 @@ def get_all_legal_inputs_for_player(board: Board, turn: PieceColor):
     #         all_inputs.append(input_str)
     return all_inputs
 
-# This function can probably be optimized heavily
-
 
 def is_in_check(board: Board, color: PieceColor) -> bool:
-    """Checks every move to see if king is attacked."""
-    checker = swap_color(color)
-    all_moves = get_all_legal_moves_for_player(board, checker)
-    for moves in all_moves:
-        coords = moves[1]
-        piece = board.get_piece(coords)
-        if piece is None:
-            continue
-        if piece.color == color and piece.type == PieceType.KING:
-            return True
+    """Looks outwards from the king for any enemy piece attacking it."""
+    king = board.get_king_coords(color)
+    if king is None:
+        return False
+    return len(get_attackers(board, king, swap_color(color))) > 0
+
+
+def has_any_legal_move(board: Board, color: PieceColor) -> bool:
+    """Returns True as soon as a single legal move is found for the given player."""
+    if LEGAL_MOVE_CACHING:
+        # Peek so the stats only count lookups that fill the cache on a miss
+        cached = LEGAL_MOVE_CACHE.peek(("player", board.get_position_hash(), color))
+        if cached is not None:
+            return len(cached) > 0
+    for old_coords in board.get_piece_coords(color):
+        for new_coords in get_all_legal_moves(board, old_coords, check_check=False):
+            if not would_move_cause_self_check(board, old_coords, new_coords):
+                return True
     return False
 
 
@@ -797,12 +1129,52 @@ def is_in_checkmate(board: Board, color: PieceColor) -> bool:
     """Returns true if the given player is in checkmate."""
     if not is_in_check(board, color):
         return False
-    all_moves = get_all_legal_moves_for_player(board, color, check_check=True)
-    if len(all_moves) == 0:
-        return True
+    return not has_any_legal_move(board, color)
+
+
+def is_in_stalemate(board: Board, color: PieceColor) -> bool:
+    """Returns true if the given player is not in check but has no legal moves."""
+    if is_in_check(board, color):
+        return False
+    return not has_any_legal_move(board, color)
+
+
+def is_repetition(board: Board, limit: int = REPETITION_LIMIT) -> bool:
+    """Returns true if the current position has occurred at least limit times."""
+    history = board.position_history
+    if len(history) == 0:
+        return False
+    current = history[-1]
+    count = 1
+    # Positions before the last capture or pawn move can never come back
+    oldest = max(0, len(history) - 1 - board.halfmove_clock)
+    # Same player to move means stepping back two plies at a time
+    for i in range(len(history) - 3, oldest - 1, -2):
+        if history[i] == current:
+            count += 1
+            if count >= limit:
+                return True
     return False
 
 
+def is_fifty_move_draw(board: Board) -> bool:
+    """Returns true if fifty moves have passed without a capture or pawn move."""
+    return board.halfmove_clock >= FIFTY_MOVE_LIMIT
+
+
+def get_game_status(board: Board, color: PieceColor) -> GameStatus:
+    """Returns the state of the game for the player about to move."""
+    if not has_any_legal_move(board, color):
+        if is_in_check(board, color):
+            return GameStatus.CHECKMATE
+        return GameStatus.STALEMATE
+    if is_repetition(board):
+        return GameStatus.THREEFOLD_REPETITION
+    if is_fifty_move_draw(board):
+        return GameStatus.FIFTY_MOVE_RULE
+    return GameStatus.ONGOING
+
+
 def print_win(color: PieceColor):
     """Declares the winner!"""
     print("==== The game is won! ====")
@@ -810,21 +1182,32 @@ def print_win(color: PieceColor):
     print("_______ GOOD GAME ________")
 
 
+def print_draw(status: GameStatus):
+    """Declares the draw!"""
+    print("==== The game is drawn! ====")
+    print(f"Reason: {status.value}")
+    print("_______ GOOD GAME ________")
+
+
 def game():
     """Main game loop."""
     board = Board()
     board.standard_board_setup()
     print(board.get_string(True))
 
+    search = Search()
+    ponderer = Ponderer(search)
+    clock = GameClock()
     turn = PieceColor.WHITE
     exit_loop = False
     print_turn(turn)
     print_instructional_text()
+    clock.start_turn()
     while exit_loop is False:
         user_input = ""
         if BOT and turn == PieceColor.BLACK:
             # user_input = coords_to_input(*get_random_move(board, turn))
-            user_input = coords_to_input(*get_best_move(board, turn))
+            user_input = coords_to_input(*get_bot_move(board, turn, search, ponderer, clock))
             print("> " + user_input)
         else:
             # User input prefix
@@ -834,14 +1217,22 @@ def game():
         print("")
         input_result = handle_input(board, turn, user_input)
         if input_result is True:
-            if is_in_checkmate(board, swap_color(turn)):
+            clock.end_turn(turn)
+            status = get_game_status(board, swap_color(turn))
+            if status != GameStatus.ONGOING:
                 print("\n" + board.get_string(True) + "")
-                print_win(turn)
+                if status == GameStatus.CHECKMATE:
+                    print_win(turn)
+                else:
+                    print_draw(status)
                 exit_loop = True
                 break
             turn = swap_color(turn)
             print_board(board, turn)
             print_instructional_text()
+            if BOT and PONDERING and turn != PieceColor.BLACK:
+                ponderer.start(board, PieceColor.BLACK)
+            clock.start_turn()
         else:
             # Move was unsuccessful
             print_instructional_text()
@@ -862,8 +1253,233 @@ def get_move_score(board: Board, old_coords: Coords, new_coords: Coords) -> int:
     captured = board.get_piece(new_coords)
     if captured is None:
         return 0
-    points = get_points_by_piece_type(captured.type)
-    return points
+    # Account for recaptures, a defended piece is not free
+    return static_exchange_evaluation(board, old_coords, new_coords)
+
+
+def get_attackers(board: Board, target: Coords, color: PieceColor) -> list[Coords]:
+    """Returns the coords of every piece of the given color that attacks target."""
+    # Look outwards from the target for the first piece in each direction
+    pawn_dy = -1 if color == PieceColor.WHITE else 1
+    lookups = [
+        ([(-1, pawn_dy), (1, pawn_dy)], 1, [PieceType.PAWN]),
+        ([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)],
+         1, [PieceType.KNIGHT]),
+        ([(-1, 0), (1, 0), (0, 1), (0, -1), (-1, -1), (-1, 1), (1, 1), (1, -1)],
+         1, [PieceType.KING]),
+        ([(-1, 0), (1, 0), (0, 1), (0, -1)], 50, [PieceType.ROOK, PieceType.QUEEN]),
+        ([(-1, -1), (-1, 1), (1, 1), (1, -1)], 50, [PieceType.BISHOP, PieceType.QUEEN]),
+    ]
+    attackers: list[Coords] = []
+    for directions, limit, piece_types in lookups:
+        for direction in directions:
+            wards = _linear_iteration(board, target, *direction, limit=limit)
+            for coords in wards["possible_capture"]:
+                piece = board.get_piece(coords)
+                if piece is not None and piece.color == color and piece.type in piece_types:
+                    attackers.append(coords)
+    return attackers
+
+
+def get_least_valuable_attacker(board: Board, target: Coords, color: PieceColor) -> Coords | None:
+    """Returns the coords of the cheapest piece of the given color attacking target."""
+    least: Coords | None = None
+    least_points = 0
+    for coords in get_attackers(board, target, color):
+        piece = board.get_piece(coords)
+        if piece is None:
+            continue
+        points = get_points_by_piece_type(piece.type)
+        if least is None or points < least_points:
+            least = coords
+            least_points = points
+    return least
+
+
+def static_exchange_evaluation(board: Board, old_coords: Coords, new_coords: Coords) -> int:
+    """
+    Returns the material won by capturing on new_coords with the piece at old_coords,
+    assuming both sides keep recapturing there with their least valuable attacker
+    for as long as it pays off.
+    """
+    piece = board.get_piece(old_coords)
+    if piece is None:
+        return 0
+    captured = board.get_piece(new_coords)
+    gain = 0 if captured is None else get_points_by_piece_type(captured.type)
+    # Play the capture without the bookkeeping of Board.move, then undo it
+    board.remove_piece(old_coords)
+    board.set_piece(piece, new_coords)
+    recapturer = get_least_valuable_attacker(board, new_coords, swap_color(piece.color))
+    if recapturer is not None:
+        # The opponent only recaptures if it doesn't lose them material
+        gain -= max(0, static_exchange_evaluation(board, recapturer, new_coords))
+    board.set_piece(captured, new_coords)
+    board.set_piece(piece, old_coords)
+    return gain
+
+
+def get_material_score_for(board: Board, color: PieceColor = PieceColor.WHITE) -> int:
+    """Returns the material balance from the point of view of the given color."""
+    score = 0
+    for piece_type in PieceType:
+        if piece_type == PieceType.KING:
+            continue
+        count = len(board.piece_squares[color][piece_type]) \
+            - len(board.piece_squares[swap_color(color)][piece_type])
+        score += count * get_points_by_piece_type(piece_type)
+    return score
+
+
+class PawnHashTable:
+    """Fixed-size table of pawn structure scores, keyed by the pawn-only hash. New entries replace old ones."""
+
+    def __init__(self, size: int = PAWN_HASH_SIZE):
+        self.size = size
+        self.slots: list[tuple[int, float] | None] = [None] * size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int) -> float | None:
+        """Returns the stored score for the pawn hash, or None."""
+        entry = self.slots[key % self.size]
+        if entry is None or entry[0] != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: int, score: float):
+        """Stores a score, replacing whatever shared its slot."""
+        self.slots[key % self.size] = (key, score)
+
+    def clear(self):
+        """Empties the table and resets the statistics."""
+        self.slots = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self) -> dict[str, int | float]:
+        """Returns hit/miss statistics for the table."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": self.size,
+            "used": sum(1 for entry in self.slots if entry is not None),
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+        }
+
+
+PAWN_HASH_TABLE = PawnHashTable()
+
+
+def _pawn_structure_score_for_white(board: Board) -> float:
+    """Scores doubled, isolated and passed pawns from white's point of view."""
+    files: dict[PieceColor, list[list[int]]] = {
+        PieceColor.WHITE: [[] for _ in range(WIDTH)],
+        PieceColor.BLACK: [[] for _ in range(WIDTH)],
+    }
+    for color in PieceColor:
+        for x, y in board.piece_squares[color][PieceType.PAWN]:
+            files[color][x].append(y)
+
+    score = 0.0
+    for color in PieceColor:
+        sign = 1 if color == PieceColor.WHITE else -1
+        own = files[color]
+        enemy = files[swap_color(color)]
+        for x in range(WIDTH):
+            if len(own[x]) == 0:
+                continue
+            neighbours = [nx for nx in (x - 1, x + 1) if 0 <= nx < WIDTH]
+            if len(own[x]) > 1:
+                score -= sign * DOUBLED_PAWN_PENALTY * (len(own[x]) - 1)
+            if all(len(own[nx]) == 0 for nx in neighbours):
+                score -= sign * ISOLATED_PAWN_PENALTY * len(own[x])
+            for y in own[x]:
+                # Passed: no enemy pawn ahead on this file or the files next to it
+                ahead = [ey for ex in [x] + neighbours for ey in enemy[ex]
+                         if (ey > y if color == PieceColor.WHITE else ey < y)]
+                if len(ahead) == 0:
+                    advanced = y - 1 if color == PieceColor.WHITE else 6 - y
+                    score += sign * (PASSED_PAWN_BONUS + PASSED_PAWN_RANK_BONUS * advanced)
+    return score
+
+
+def get_pawn_structure_score_for(board: Board, color: PieceColor = PieceColor.WHITE) -> float:
+    """Returns the pawn structure score for color, from the pawn hash table when possible."""
+    score = PAWN_HASH_TABLE.get(board.pawn_hash)
+    if score is None:
+        score = _pawn_structure_score_for_white(board)
+        PAWN_HASH_TABLE.put(board.pawn_hash, score)
+    return score if color == PieceColor.WHITE else -score
+
+
+def evaluate(board: Board, color: PieceColor = PieceColor.WHITE) -> float:
+    """Static evaluation for color: material plus pawn structure."""
+    score: float = get_material_score_for(board, color)
+    if PAWN_STRUCTURE_EVAL:
+        score += get_pawn_structure_score_for(board, color)
+    return score
+
+
+def has_non_pawn_material(board: Board, color: PieceColor) -> bool:
+    """Returns true if color has any piece other than pawns and the king."""
+    for piece_type in PieceType:
+        if piece_type not in (PieceType.PAWN, PieceType.KING) \
+                and len(board.piece_squares[color][piece_type]) > 0:
+            return True
+    return False
+
+
+def get_good_captures(board: Board, color: PieceColor) -> list[tuple[Coords, Coords]]:
+    """Returns captures that don't lose material, best exchanges first. May self-check."""
+    scored_captures: list[tuple[int, tuple[Coords, Coords]]] = []
+    for coords in get_all_legal_moves_for_player(board, color):
+        captured = board.get_piece(coords[1])
+        if captured is None or captured.color == color:
+            continue
+        exchange = static_exchange_evaluation(board, *coords)
+        if exchange < 0:
+            continue
+        scored_captures.append((exchange, coords))
+    scored_captures.sort(key=lambda scored: scored[0], reverse=True)
+    return [coords for _, coords in scored_captures]
+
+
+def quiescence_search(board: Board, color: PieceColor,
+                      alpha: float = -100, beta: float = 100,
+                      depth: int = QUIESCENCE_DEPTH) -> float:
+    """Scores the position for color, searching only captures until the position is quiet."""
+    # Standing pat: the side to move doesn't have to capture
+    stand_pat = evaluate(board, color)
+    if stand_pat >= beta or depth == 0:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+    for coords in get_good_captures(board, color):
+        board.move(*coords)
+        if is_in_check(board, color):
+            board.revert_last_move()
+            continue
+        score = -quiescence_search(board, swap_color(color), -beta, -alpha, depth - 1)
+        board.revert_last_move()
+        if score >= beta:
+            return score
+        alpha = max(alpha, score)
+    return alpha
+
+
+def get_move_quiescence_score(board: Board, old_coords: Coords, new_coords: Coords) -> float:
+    """Plays the move and returns the quiet material score for the moving side."""
+    piece = board.get_piece(old_coords)
+    if piece is None:
+        return -100
+    color = piece.color
+    board.move(old_coords, new_coords)
+    score = -quiescence_search(board, swap_color(color))
+    board.revert_last_move()
+    return score
 
 
 def get_all_attacked_by(board: Board, color: PieceColor) -> list[Coords]:
@@ -902,12 +1518,20 @@ def get_move_board_score(board: Board, old_coords: Coords, new_coords: Coords, r
     return final_score
 
 
-def get_best_move(board: Board, color: PieceColor) -> tuple[Coords, Coords]:
+def get_best_move(board: Board, color: PieceColor, depth: int = 1) -> tuple[Coords, Coords]:
+    # Deeper than one ply needs the full search
+    if depth > 1:
+        best_move = Search().iterate(board, color, depth)
+        if best_move is not None:
+            return best_move
     legal = get_all_legal_moves_for_player(board, color, check_check=True)
     best_moves: list[tuple[Coords, Coords]] = []
     best_move_score = -100
     for coords in legal:
-        move_score = get_move_board_score(board, *coords)
+        if QUIESCENCE_SEARCH:
+            move_score = get_move_quiescence_score(board, *coords)
+        else:
+            move_score = get_move_board_score(board, *coords)
         if len(best_moves) == 0 or move_score > best_move_score:
             best_move_score = move_score
             best_moves = [coords]
@@ -932,4 +1556,465 @@ def get_random_move(board: Board, color: PieceColor) -> tuple[Coords, Coords]:
     return random_move
 
 
-game()
+# Larger than any material score, smaller than the search window
+MATE_SCORE = 1000
+SEARCH_INFINITY = 10000
+# Mates score MATE_SCORE minus the plies to mate, so anything past this is a forced mate
+MATE_THRESHOLD = MATE_SCORE - 500
+# Width of a null window, well under the 0.05 steps the evaluation moves in
+SEARCH_EPSILON = 0.01
+
+# Transposition table entry flags
+TT_EXACT = 0
+TT_LOWER_BOUND = 1
+TT_UPPER_BOUND = 2
+
+
+def _score_to_tt(score: float, ply: int) -> float:
+    """Stores mate scores as plies to mate from this node instead of from the root."""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score: float, ply: int) -> float:
+    """Turns a stored mate score back into plies to mate from the root."""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+class SearchAborted(Exception):
+    """Raised inside a search when it has to stop in the middle of an iteration."""
+
+
+def _move_key(coords: tuple[Coords, Coords]) -> tuple[str, str]:
+    """Returns a hashable key for a move, for the search tables."""
+    return (coords[0].to_board_key(), coords[1].to_board_key())
+
+
+class SharedTranspositionStore:
+    """
+    Transposition table in a memory-mapped file, shared between processes and kept between runs.
+    Updates are lock-free: each slot holds key ^ data next to data, so a slot torn by two
+    processes writing at once reads back as a miss instead of a wrong entry.
+    """
+    MAGIC = b"PYCHESTT"
+    HEADER = struct.Struct("<8sII")
+    SLOT = struct.Struct("<QQ")
+    # score, depth, flag, from square, to square (y * 8 + x, 255 for none)
+    DATA = struct.Struct("<fBBBB")
+    VERSION = 1
+    NO_SQUARE = 255
+
+    def __init__(self, path: str, entries: int = SHARED_STORE_ENTRIES):
+        if not os.path.exists(path):
+            self._create(path, entries)
+        # Never overwrite a file that isn't a store, it could be anything the user pointed us at
+        if not self._is_valid_file(path):
+            raise ValueError(f"{path} exists and is not a version {self.VERSION} transposition store")
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        _, _, self.entries = self.HEADER.unpack_from(self.map, 0)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _create(self, path: str, entries: int):
+        """
+        Builds the store in a temp file next to path, then links it into place.
+        Other processes only ever see a complete store, and if one of them wins
+        the race to create it, theirs is kept and ours is thrown away.
+        """
+        # Unique per process and thread, in the same directory so the link can't cross filesystems
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        handle = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(self.HEADER.pack(self.MAGIC, self.VERSION, entries))
+                file.truncate(self.HEADER.size + entries * self.SLOT.size)
+            try:
+                os.link(temp_path, path)
+            except FileExistsError:
+                pass
+        finally:
+            os.remove(temp_path)
+
+    def _is_valid_file(self, path: str) -> bool:
+        """Returns true if path is an existing store with a matching header and size."""
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as file:
+            header = file.read(self.HEADER.size)
+        if len(header) != self.HEADER.size:
+            return False
+        magic, version, entries = self.HEADER.unpack(header)
+        return magic == self.MAGIC and version == self.VERSION \
+            and os.path.getsize(path) == self.HEADER.size + entries * self.SLOT.size
+
+    def _offset(self, key: int) -> int:
+        """Returns the file offset of the slot for key."""
+        return self.HEADER.size + (key % self.entries) * self.SLOT.size
+
+    def get(self, key: int) -> tuple[int, float, int, tuple[str, str] | None] | None:
+        """Returns (depth, score, flag, best move key) like Search's table, or None."""
+        check, data = self.SLOT.unpack_from(self.map, self._offset(key))
+        if data == 0 or check ^ data != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        score, depth, flag, old_square, new_square = self.DATA.unpack(data.to_bytes(8, "little"))
+        move_key = None
+        if old_square != self.NO_SQUARE:
+            move_key = (_square_key(old_square), _square_key(new_square))
+        return (depth, score, flag, move_key)
+
+    def put(self, key: int, depth: int, score: float, flag: int, best_move: tuple[Coords, Coords] | None):
+        """Stores an entry, unless the slot already holds a deeper result for the same position."""
+        offset = self._offset(key)
+        check, data = self.SLOT.unpack_from(self.map, offset)
+        if data != 0 and check ^ data == key and data.to_bytes(8, "little")[4] > depth:
+            return
+        old_square = new_square = self.NO_SQUARE
+        if best_move is not None:
+            old_square = best_move[0].y * WIDTH + best_move[0].x
+            new_square = best_move[1].y * WIDTH + best_move[1].x
+        data = int.from_bytes(self.DATA.pack(score, min(depth, 255), flag, old_square, new_square), "little")
+        self.SLOT.pack_into(self.map, offset, key ^ data, data)
+        self.writes += 1
+
+    def flush(self):
+        """Writes the mapped pages back to the file."""
+        self.map.flush()
+
+    def close(self):
+        """Flushes and closes the store."""
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    def get_stats(self) -> dict[str, int | float]:
+        """Returns hit/miss statistics for this process."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "entries": self.entries,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+        }
+
+
+def _square_key(square: int) -> str:
+    """Returns the board key of a square index (y * 8 + x)."""
+    return Coords(square % WIDTH, square // WIDTH).to_board_key()
+
+
+class Search:
+    """
+    Iterative deepening alpha-beta search.
+    The transposition table and move ordering history are kept between searches,
+    so a pondered search can be picked up where it left off.
+    """
+
+    def __init__(self, null_move: bool | None = None,
+                 late_move_reductions: bool | None = None,
+                 check_extensions: bool | None = None,
+                 shared_store: SharedTranspositionStore | None = None):
+        # None follows the module flag, read at the start of each search
+        self.null_move_setting = null_move
+        self.late_move_reductions_setting = late_move_reductions
+        self.check_extensions_setting = check_extensions
+        self.null_move = False
+        self.late_move_reductions = False
+        self.check_extensions = False
+        # Depth of the current iteration, check extensions are limited by it
+        self.root_depth = 0
+        # Optional on-disk table, consulted when the in-memory one misses
+        self.shared_store = shared_store
+        # Position hash -> (depth, score, flag, best move key)
+        self.transposition_table: dict[int, tuple[int, float, int, tuple[str, str] | None]] = {}
+        # Move key -> bonus for quiet moves that caused a beta cutoff
+        self.history: dict[tuple[str, str], int] = {}
+        self.stop_event = threading.Event()
+        self.deadline: float | None = None
+        self.max_nodes: int | None = None
+        self.nodes = 0
+        self.completed_depth = 0
+        self.best_move: tuple[Coords, Coords] | None = None
+        self.best_score: float = 0
+        self.root_best_move: tuple[Coords, Coords] | None = None
+
+    def stop(self):
+        """Tells a running search to give up at the next node. Clear stop_event before reusing."""
+        self.stop_event.set()
+
+    def iterate(self, board: Board, color: PieceColor, max_depth: int = SEARCH_DEPTH,
+                time_limit: float | None = None, resume: bool = False,
+                max_nodes: int | None = None) -> tuple[Coords, Coords] | None:
+        """
+        Searches one ply deeper each iteration until max_depth, the time limit or max_nodes.
+        Only completed iterations count. A new iteration isn't started if it probably won't finish.
+        resume continues from the last completed depth, for ponder hits.
+        Returns the best move, or None if no iteration completed.
+        """
+        start = time.perf_counter()
+        self.deadline = None if time_limit is None else start + time_limit
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.null_move = NULL_MOVE_PRUNING if self.null_move_setting is None else self.null_move_setting
+        self.late_move_reductions = LATE_MOVE_REDUCTIONS if self.late_move_reductions_setting is None \
+            else self.late_move_reductions_setting
+        self.check_extensions = CHECK_EXTENSIONS if self.check_extensions_setting is None \
+            else self.check_extensions_setting
+        if not resume:
+            self.completed_depth = 0
+            self.best_move = None
+            # Otherwise a position with no legal moves returns the last search's move
+            self.root_best_move = None
+            # Old history is less relevant in the new position
+            for key in self.history:
+                self.history[key] //= 2
+        for depth in range(self.completed_depth + 1, max_depth + 1):
+            self.root_depth = depth
+            try:
+                score = self.negamax(board, color, depth, -SEARCH_INFINITY, SEARCH_INFINITY, 0)
+            except SearchAborted:
+                break
+            self.completed_depth = depth
+            self.best_move = self.root_best_move
+            self.best_score = score
+            if self.best_move is None or abs(score) >= MATE_THRESHOLD:
+                break
+            # Iteration boundary: the next iteration takes longer than all the previous ones
+            if time_limit is not None and time.perf_counter() - start > time_limit / 2:
+                break
+        return self.best_move
+
+    def _check_stop(self):
+        """Raises SearchAborted if the search was stopped or ran out of time."""
+        if self.stop_event.is_set():
+            raise SearchAborted()
+        # Always finish the first iteration so there is a move to play
+        if self.completed_depth == 0:
+            return
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchAborted()
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchAborted()
+
+    def negamax(self, board: Board, color: PieceColor, depth: int,
+                alpha: float, beta: float, ply: int, allow_null: bool = True) -> float:
+        """Alpha-beta search. Returns the score for color."""
+        self.nodes += 1
+        self._check_stop()
+        if ply > 0 and (is_repetition(board, 2) or is_fifty_move_draw(board)):
+            return 0
+
+        key = board.get_position_hash(color)
+        entry = self.transposition_table.get(key)
+        if entry is None and self.shared_store is not None:
+            entry = self.shared_store.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, tt_move = entry
+            entry_score = _score_from_tt(entry_score, ply)
+            if ply > 0 and entry_depth >= depth:
+                if entry_flag == TT_EXACT:
+                    return entry_score
+                if entry_flag == TT_LOWER_BOUND and entry_score >= beta:
+                    return entry_score
+                if entry_flag == TT_UPPER_BOUND and entry_score <= alpha:
+                    return entry_score
+
+        if depth <= 0:
+            return quiescence_search(board, color, alpha, beta)
+
+        legal = get_all_legal_moves_for_player(board, color, check_check=True)
+        in_check = is_in_check(board, color)
+        if len(legal) == 0:
+            # Mates further from the root score lower, so the shortest one is preferred
+            return -MATE_SCORE + ply if in_check else 0
+
+        # Null move: if passing still fails high, a real move surely would too.
+        # Not when in check (passing is illegal) or with only pawns left (zugzwang is likely).
+        if self.null_move and allow_null and ply > 0 and not in_check \
+                and depth > NULL_MOVE_REDUCTION and beta < MATE_THRESHOLD \
+                and has_non_pawn_material(board, color):
+            board.pass_turn()
+            try:
+                score = -self.negamax(board, swap_color(color), depth - 1 - NULL_MOVE_REDUCTION,
+                                      -beta, -beta + SEARCH_EPSILON, ply + 1, allow_null=False)
+            finally:
+                board.revert_last_move()
+            if score >= beta:
+                return score
+
+        original_alpha = alpha
+        best_score = -SEARCH_INFINITY
+        best_move: tuple[Coords, Coords] | None = None
+        for index, coords in enumerate(self.order_moves(board, legal, tt_move)):
+            is_capture = board.get_piece(coords[1]) is not None
+            board.move(*coords)
+            board.next_turn()
+            try:
+                gives_check = (self.check_extensions or self.late_move_reductions) \
+                    and is_in_check(board, swap_color(color))
+                new_depth = depth - 1
+                # Check extension: forcing lines are searched one ply deeper, within reason
+                if self.check_extensions and gives_check and ply < self.root_depth * 2:
+                    new_depth += 1
+                # Late move reduction: quiet moves ordered late are probably bad,
+                # search them shallower and only re-search if they surprise us
+                score = alpha + SEARCH_EPSILON
+                if self.late_move_reductions and index >= LATE_MOVE_MIN_INDEX \
+                        and depth >= LATE_MOVE_MIN_DEPTH and not in_check \
+                        and not is_capture and not gives_check:
+                    score = -self.negamax(board, swap_color(color), new_depth - 1,
+                                          -alpha - SEARCH_EPSILON, -alpha, ply + 1)
+                if score > alpha:
+                    score = -self.negamax(board, swap_color(color), new_depth, -beta, -alpha, ply + 1)
+            finally:
+                board.revert_last_move()
+            if score > best_score:
+                best_score = score
+                best_move = coords
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if board.get_piece(coords[1]) is None:
+                    move_key = _move_key(coords)
+                    self.history[move_key] = self.history.get(move_key, 0) + depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = TT_UPPER_BOUND
+        elif best_score >= beta:
+            flag = TT_LOWER_BOUND
+        else:
+            flag = TT_EXACT
+        tt_score = _score_to_tt(best_score, ply)
+        self.transposition_table[key] = (depth, tt_score, flag,
+                                         None if best_move is None else _move_key(best_move))
+        if self.shared_store is not None:
+            self.shared_store.put(key, depth, tt_score, flag, best_move)
+        if ply == 0:
+            self.root_best_move = best_move
+        return best_score
+
+    def order_moves(self, board: Board, legal: list[tuple[Coords, Coords]],
+                    tt_move: tuple[str, str] | None) -> list[tuple[Coords, Coords]]:
+        """Sorts moves best first: the stored best move, good captures, then quiet moves by history."""
+        def move_order(coords: tuple[Coords, Coords]) -> float:
+            move_key = _move_key(coords)
+            if move_key == tt_move:
+                return SEARCH_INFINITY
+            if board.get_piece(coords[1]) is not None:
+                return MATE_SCORE + static_exchange_evaluation(board, *coords)
+            return self.history.get(move_key, 0)
+        return sorted(legal, key=move_order, reverse=True)
+
+    def get_tt_move(self, board: Board, color: PieceColor) -> tuple[Coords, Coords] | None:
+        """Returns the stored best move for color in this position, if it is legal."""
+        entry = self.transposition_table.get(board.get_position_hash(color))
+        if entry is None or entry[3] is None:
+            return None
+        for coords in get_all_legal_moves_for_player(board, color, check_check=True):
+            if _move_key(coords) == entry[3]:
+                return coords
+        return None
+
+
+class GameClock:
+    """Keeps the remaining thinking time of both players, in seconds."""
+
+    def __init__(self, seconds: float = GAME_CLOCK_SECONDS,
+                 increment: float = CLOCK_INCREMENT_SECONDS):
+        self.remaining = {PieceColor.WHITE: seconds, PieceColor.BLACK: seconds}
+        self.increment = increment
+        self.turn_start = time.perf_counter()
+
+    def start_turn(self):
+        """Starts the clock for the player about to move."""
+        self.turn_start = time.perf_counter()
+
+    def end_turn(self, color: PieceColor):
+        """Charges the time since start_turn to color, then adds the increment."""
+        self.remaining[color] -= time.perf_counter() - self.turn_start
+        self.remaining[color] += self.increment
+
+    def allot_move_time(self, color: PieceColor, moves_to_go: int = MOVES_TO_GO) -> float:
+        """Returns how many seconds color should spend on this move."""
+        remaining = max(0, self.remaining[color])
+        allotted = remaining / moves_to_go + self.increment * 0.8
+        # Never plan to use more than half of what's left
+        return max(0.05, min(allotted, remaining / 2))
+
+    def get_string(self, color: PieceColor) -> str:
+        """Returns the remaining time of color as m:ss."""
+        remaining = max(0, int(self.remaining[color]))
+        return f"{remaining // 60}:{remaining % 60:02d}"
+
+
+class Ponderer:
+    """Searches the bot's answer to the expected opponent move while the opponent thinks."""
+
+    def __init__(self, search: Search):
+        self.search = search
+        self.thread: threading.Thread | None = None
+        self.board: Board | None = None
+        self.expected_move: tuple[Coords, Coords] | None = None
+
+    def start(self, board: Board, color: PieceColor):
+        """Starts pondering for color, with the opponent to move on board."""
+        self.stop()
+        self.board = deepcopy(board)
+        self.expected_move = None
+        self.thread = threading.Thread(target=self._ponder, args=(self.board, color), daemon=True)
+        self.thread.start()
+
+    def _ponder(self, board: Board, color: PieceColor):
+        """Guesses the opponent's move, plays it and searches the reply until stopped."""
+        opponent = swap_color(color)
+        expected = self.search.get_tt_move(board, opponent)
+        if expected is None:
+            expected = self.search.iterate(board, opponent, 1)
+        if expected is None or self.search.stop_event.is_set():
+            self.board = None
+            return
+        self.expected_move = expected
+        board.move(*expected)
+        board.next_turn()
+        self.search.iterate(board, color, SEARCH_DEPTH)
+
+    def stop(self, board: Board | None = None) -> bool:
+        """Stops pondering. Returns True if the opponent's move reached the pondered position."""
+        if self.thread is None:
+            return False
+        self.search.stop()
+        self.thread.join()
+        self.thread = None
+        self.search.stop_event.clear()
+        hit = board is not None and self.board is not None \
+            and self.board.get_position_hash() == board.get_position_hash()
+        self.board = None
+        return hit and self.search.completed_depth > 0
+
+
+def get_bot_move(board: Board, color: PieceColor, search: Search,
+                 ponderer: Ponderer, clock: GameClock) -> tuple[Coords, Coords]:
+    """Picks the bot's move within its time allotment, reusing a pondered search on a hit."""
+    ponder_hit = ponderer.stop(board)
+    time_limit = clock.allot_move_time(color)
+    best_move = search.iterate(board, color, SEARCH_DEPTH, time_limit, resume=ponder_hit)
+    if best_move is None:
+        return get_best_move(board, color)
+    return best_move
+
+
+if __name__ == "__main__":
+    game()
@@ -0,0 +1,177 @@
+"""Proof-number search mate solver for 'mate in N?' puzzles."""
+import argparse
+import sys
+import time
+
+from main import (Board, Coords, PieceColor, board_from_fen, coords_to_input,
+                  get_all_legal_moves_for_player, is_in_checkmate, swap_color)
+
+
+# Stands in for infinity in proof and disproof numbers
+PN_INFINITY = 10 ** 9
+DEFAULT_NODE_BUDGET = 200000
+
+PROVEN = "proven"
+DISPROVEN = "disproven"
+UNKNOWN = "unknown"
+
+
+class ProofNode:
+    """A position in the proof tree. Attacker nodes are OR nodes, defender nodes are AND nodes."""
+    __slots__ = ("move", "parent", "children", "proof", "disproof", "attacker_to_move", "moves_left")
+
+    def __init__(self, move: tuple[Coords, Coords] | None, parent: "ProofNode | None",
+                 attacker_to_move: bool, moves_left: int):
+        self.move = move
+        self.parent = parent
+        self.children: list[ProofNode] | None = None
+        self.proof = 1
+        self.disproof = 1
+        self.attacker_to_move = attacker_to_move
+        # Attacker moves still allowed to deliver mate
+        self.moves_left = moves_left
+
+    def is_solved(self) -> bool:
+        """Returns true once the node is proven or disproven."""
+        return self.proof == 0 or self.disproof == 0
+
+    def update(self):
+        """Recomputes the proof and disproof numbers from the children."""
+        # Leaves and nodes without moves keep the numbers they were given
+        if not self.children:
+            return
+        if self.attacker_to_move:
+            self.proof = min(child.proof for child in self.children)
+            self.disproof = min(PN_INFINITY, sum(child.disproof for child in self.children))
+        else:
+            self.proof = min(PN_INFINITY, sum(child.proof for child in self.children))
+            self.disproof = min(child.disproof for child in self.children)
+
+
+class MateSolver:
+    """
+    Proves or disproves a forced mate in at most N moves with proof-number search.
+    Memory is bounded by the node budget, and solved subtrees are freed as soon as they are solved.
+    """
+
+    def __init__(self, node_budget: int = DEFAULT_NODE_BUDGET):
+        self.node_budget = node_budget
+        self.nodes = 0
+        self.attacker = PieceColor.WHITE
+
+    def solve(self, board: Board, attacker: PieceColor, moves: int) -> tuple[str, tuple[Coords, Coords] | None]:
+        """Returns (PROVEN, first move), (DISPROVEN, None) or (UNKNOWN, None) if the budget ran out."""
+        self.nodes = 1
+        root = ProofNode(None, None, True, moves)
+        self.attacker = attacker
+        while not root.is_solved() and self.nodes < self.node_budget:
+            # Walk down to the most proving node, playing the moves on the board
+            node = root
+            while node.children is not None:
+                node = self._most_proving_child(node)
+                assert node.move is not None
+                board.move(*node.move)
+                board.next_turn()
+            self._expand(board, node)
+            # Back up the new numbers, undoing the moves on the way
+            while True:
+                node.update()
+                if node.is_solved() and node is not root:
+                    # Only the root's children are needed for the answer
+                    node.children = None
+                if node.parent is None:
+                    break
+                node = node.parent
+                board.revert_last_move()
+        if root.proof == 0:
+            assert root.children is not None
+            for child in root.children:
+                if child.proof == 0:
+                    return PROVEN, child.move
+        if root.disproof == 0:
+            return DISPROVEN, None
+        return UNKNOWN, None
+
+    def _most_proving_child(self, node: ProofNode) -> ProofNode:
+        """The attacker follows the easiest proof, the defender the easiest disproof."""
+        assert node.children is not None
+        if node.attacker_to_move:
+            return min(node.children, key=lambda child: child.proof)
+        return min(node.children, key=lambda child: child.disproof)
+
+    def _expand(self, board: Board, node: ProofNode):
+        """Creates and scores the children of node, with the board at node's position."""
+        color = self.attacker if node.attacker_to_move else swap_color(self.attacker)
+        node.children = []
+        for coords in get_all_legal_moves_for_player(board, color, check_check=True):
+            moves_left = node.moves_left - 1 if node.attacker_to_move else node.moves_left
+            child = ProofNode(coords, node, not node.attacker_to_move, moves_left)
+            board.move(*coords)
+            board.next_turn()
+            self._score_new_node(board, child)
+            board.revert_last_move()
+            node.children.append(child)
+            self.nodes += 1
+            # The attacker only needs one mate, the defender only one escape
+            if (node.attacker_to_move and child.proof == 0) or \
+                    (not node.attacker_to_move and child.disproof == 0):
+                break
+        if len(node.children) == 0:
+            # No legal moves: the game ended here, mate is checked by the parent
+            node.proof, node.disproof = (PN_INFINITY, 0) if node.attacker_to_move else (0, PN_INFINITY)
+
+    def _score_new_node(self, board: Board, node: ProofNode):
+        """Sets the initial proof and disproof numbers of a freshly created node."""
+        if node.attacker_to_move:
+            # The defender just moved, the attacker must still have a move left to mate
+            if node.moves_left == 0:
+                node.proof, node.disproof = PN_INFINITY, 0
+            return
+        defender = swap_color(self.attacker)
+        replies = get_all_legal_moves_for_player(board, defender, check_check=True)
+        if len(replies) == 0:
+            if is_in_checkmate(board, defender):
+                node.proof, node.disproof = 0, PN_INFINITY
+            else:
+                # Stalemate
+                node.proof, node.disproof = PN_INFINITY, 0
+        elif node.moves_left == 0:
+            node.proof, node.disproof = PN_INFINITY, 0
+        else:
+            # Every defender reply has to be refuted
+            node.proof = len(replies)
+
+
+def solve_mate(fen: str, moves: int, node_budget: int = DEFAULT_NODE_BUDGET) -> tuple[str, str | None, int]:
+    """Solves 'mate in moves?' for the side to move. Returns (status, first move, nodes)."""
+    board, turn = board_from_fen(fen)
+    solver = MateSolver(node_budget)
+    status, first_move = solver.solve(board, turn, moves)
+    return status, None if first_move is None else coords_to_input(*first_move), solver.nodes
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fen", help="position with the attacker to move")
+    parser.add_argument("--moves", type=int, default=2, help="mate in this many moves")
+    parser.add_argument("--nodes", type=int, default=DEFAULT_NODE_BUDGET, help="node budget")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    try:
+        status, first_move, nodes = solve_mate(args.fen, args.moves, args.nodes)
+    except ValueError as ex:
+        print(f"!!! {ex}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    if status == PROVEN:
+        print(f"| Mate in {args.moves} found, starting with {first_move}")
+    elif status == DISPROVEN:
+        print(f"| There is no mate in {args.moves}")
+    else:
+        print(f"| Node budget ran out, mate in {args.moves} is unknown")
+    print(f"| {nodes} nodes in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()